@@ -20,14 +20,19 @@ import setuptools_scm  # noqa: F401
 import tomli  # noqa: F401
 
 from contextlib import contextmanager
-import glob
+import hashlib
 import os
 from pathlib import Path
+import platform
+import shlex
 import sys
+from typing import (List, Optional)
 from setuptools import setup, Extension, Distribution
 from setuptools.command.build_ext import build_ext
 import shutil
+import subprocess
 import sysconfig
+import tempfile
 
 # Use os.path.abspath() instead of Path.resolve() because the build on Windows won't work
 # if the resulting path is a UNC path, and resolve() likes to convert network shares mapped
@@ -41,6 +46,7 @@ CONFIGURE_SCRIPT = LIBUSB_DIR / "configure"
 VS_PROJ = LIBUSB_DIR / "msvc" / "libusb_dll_2019.vcxproj"
 
 PACKAGE_NAME = 'libusb_package'
+PREBUILT_DIR = ROOT_DIR / "src" / PACKAGE_NAME / "_prebuilt"
 
 # check for mingw environment (recommended method from msys2.org/docs/python)
 IS_CPYTHON_MINGW = os.name == "nt" and sysconfig.get_platform().startswith("mingw")
@@ -66,19 +72,119 @@ def temp_chdir(path: Path):
     finally:
         os.chdir(saved_cwd)
 
-def get_relative_sibling_path(from_path: Path, to_path: Path) -> Path:
-    # Get common path base of absolute from and to paths. We don't want to resolve symlinks, though.
-    from_path_abs = Path(os.path.abspath(from_path))
-    to_path_abs = Path(os.path.abspath(to_path))
-    common = Path(os.path.commonpath([from_path_abs, to_path_abs]))
+def copy_library(src_path: Path, dest_path: Path) -> None:
+    """@brief Copy a file, letting the OS copy the data without passing through userspace buffers.
+
+    shutil.copyfile() uses sendfile() on Linux and fcopyfile() on macOS. On Windows, CopyFileExW()
+    is used when available. The permission bits are copied afterwards, like shutil.copy().
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        if ctypes.windll.kernel32.CopyFileExW(str(src_path), str(dest_path), None, None, None, 0):
+            shutil.copymode(src_path, dest_path)
+            return
+        print(f"CopyFileExW failed ({ctypes.GetLastError()}); falling back to shutil.copyfile()")
+    shutil.copyfile(src_path, dest_path)
+    shutil.copymode(src_path, dest_path)
+
+def get_shared_library_suffix() -> str:
+    """@brief Return the shared library filename suffix, including the dot, for the current platform."""
+    if sys.platform == 'darwin':
+        return '.dylib'
+    elif sys.platform == 'cygwin' or sys.platform == 'win32':
+        return '.dll'
+    else:
+        return '.so'
 
-    # Generate a sequence of '..' steps to move from from_path to common.
-    from_rel = from_path_abs.relative_to(common)
-    up_path = os.path.join('', *([os.path.pardir] * len(from_rel.parts)))
+def find_files_with_suffix(dir_path: Path, suffix: str) -> List[Path]:
+    """@brief Return paths of the files in a directory with the given filename suffix.
 
-    # Combine into the final path.
-    result = up_path / to_path_abs.relative_to(common)
-    return result
+    An empty list is returned if the directory doesn't exist.
+    """
+    try:
+        with os.scandir(dir_path) as it:
+            return [Path(e.path) for e in it if e.name.endswith(suffix)]
+    except FileNotFoundError:
+        return []
+
+def link_or_copy_library(src_path: Path, dest_path: Path) -> None:
+    """@brief Hardlink a file if source and destination are on the same filesystem, otherwise copy it.
+
+    If the source is a symlink, such as the unversioned library created by libtool, the link target
+    is hardlinked rather than the symlink itself.
+    """
+    if os.stat(src_path).st_dev == os.stat(dest_path.parent).st_dev:
+        real_src_path = os.path.realpath(src_path)
+        print(f"Linking output path {dest_path} to {real_src_path}")
+        try:
+            os.link(real_src_path, str(dest_path))
+            return
+        except OSError as err:
+            print(f"Error attempting to create hardlink: {err}")
+    print(f"Copying {src_path} to output path {dest_path}")
+    copy_library(src_path, dest_path)
+
+def get_target_machine() -> str:
+    """@brief Return the machine architecture that libusb is being built for.
+
+    This follows the same target selection as the build: the ARCHFLAGS architecture for cibuildwheel
+    builds on macOS, which may be cross-compiled, and the bitness of Python on Windows.
+    """
+    if sys.platform == 'darwin' and os.environ.get('CIBUILDWHEEL') == '1':
+        archflags = os.environ.get('ARCHFLAGS', '').split()
+        if archflags:
+            return archflags[-1]
+    elif sys.platform == 'win32':
+        return "AMD64" if IS_64_BIT else "x86"
+    return platform.machine()
+
+def get_compiler(var: str, candidates: List[str]) -> str:
+    """@brief Return the compiler command from an env var, or else the first installed candidate.
+
+    This follows autoconf's default compiler selection. The last candidate is returned if none are found.
+    """
+    compiler = os.environ.get(var)
+    if compiler:
+        return compiler
+    for candidate in candidates:
+        if shutil.which(candidate):
+            return candidate
+    return candidates[-1]
+
+def check_compiler_flags(compiler: str, flags: List[str]) -> bool:
+    """@brief Test whether a C compiler accepts the given flags by building a trivial program."""
+    cc = shlex.split(compiler)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        src_path = Path(temp_dir, "flags_test.c")
+        src_path.write_text("int main(void) { return 0; }\n")
+        try:
+            result = subprocess.run([*cc, *flags, str(src_path), '-o', str(Path(temp_dir, "flags_test"))],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            return False
+        return result.returncode == 0
+
+def find_compiler_cache(*names: str) -> Optional[Path]:
+    """@brief Return the path to the first of the named compiler caches that is installed.
+
+    None is returned if none are found, or if the LIBUSB_PACKAGE_NO_CACHE env var is set.
+    """
+    if os.environ.get('LIBUSB_PACKAGE_NO_CACHE'):
+        return None
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            return Path(path)
+    return None
+
+def is_compiler_cached(compiler: str) -> bool:
+    """@brief Return whether a compiler command is already wrapped by ccache or sccache."""
+    words = shlex.split(compiler)
+    return bool(words) and Path(words[0]).stem in ('ccache', 'sccache')
+
+def get_relative_sibling_path(from_path: Path, to_path: Path) -> Path:
+    # Use absolute paths rather than resolving them, since we don't want to resolve symlinks.
+    return Path(os.path.relpath(os.path.abspath(to_path), start=os.path.abspath(from_path)))
 
 
 # Based on code from https://github.com/libdynd/dynd-python
@@ -91,6 +197,19 @@ class libusb_build_ext(build_ext):
     self._found_names = []
     self._found_paths = []
 
+    # Number of parallel build jobs. Use the build_ext --parallel option if provided, then the
+    # MAX_JOBS env var, and finally the CPU count.
+    max_jobs = os.environ.get('MAX_JOBS', '')
+    try:
+        max_jobs_count = int(max_jobs or 0)
+    except ValueError:
+        max_jobs_count = -1
+    if max_jobs_count < 0:
+        print(f"Warning: ignoring invalid MAX_JOBS='{max_jobs}'")
+        max_jobs_count = 0
+    jobs = self.parallel or max_jobs_count or (os.cpu_count() or 4)
+    print(f"jobs = {jobs}")
+
     # The staging directory for the module being built.
     if self.inplace:
         build_py = self.get_finalized_command('build_py')
@@ -107,6 +226,10 @@ class libusb_build_ext(build_ext):
     print(f"build_temp = {build_temp}")
     print(f"build_lib = {build_lib}")
 
+    # Use a prebuilt library instead of building, if one is provided for this platform.
+    if self._install_prebuilt(build_lib):
+        return
+
     # Make sure the build directory exists.
     if not build_temp.is_dir():
         self.mkpath(str(build_temp))
@@ -115,22 +238,52 @@ class libusb_build_ext(build_ext):
         # Change to the build directory during the build.
         with temp_chdir(build_temp):
             if sys.platform != 'win32' or IS_CPYTHON_MINGW:
-                # Set optimization and enable extra warnings.
-                # These flags are taken from libusb/.private/ci-build.sh.
-                cflags = [
-                    "-O2",
-                    "-Winline",
-                    "-Wmissing-include-dirs",
-                    "-Wnested-externs",
-                    "-Wpointer-arith",
-                    "-Wredundant-decls",
-                    "-Wswitch-enum",
-                    ]
+                # Set optimization, including link-time optimization. The library is built once per
+                # wheel, so trade build time for runtime performance. Extra warnings are only enabled for
+                # development builds, since they add compile time and nobody reads them in release builds.
+                # The warning flags are taken from libusb/.private/ci-build.sh.
+                cflags = ["-O3", "-pipe"]
+                ldflags = [] if sys.platform == 'darwin' else ["-Wl,-O1"]
+
+                # Resolve the compilers once, so the flag checks below test the same compiler that is
+                # passed to configure.
+                cc = get_compiler('CC', ['gcc', 'cc'])
+                cxx = get_compiler('CXX', ['g++', 'c++'])
+
+                # Only use the LTO flags the compiler accepts. For instance, -flto=auto requires GCC 10.
+                # Set LIBUSB_PACKAGE_NO_LTO to disable LTO entirely.
+                if not os.environ.get('LIBUSB_PACKAGE_NO_LTO'):
+                    if sys.platform == 'darwin':
+                        lto_candidates = ["-flto=thin"]
+                    else:
+                        lto_candidates = ["-flto=auto", "-flto"]
+                    for lto_flag in lto_candidates:
+                        if check_compiler_flags(cc, [lto_flag]):
+                            cflags += [lto_flag]
+                            ldflags += [lto_flag]
+                            break
+                    else:
+                        print("Warning: compiler does not support LTO; building without it")
+                if check_compiler_flags(cc, ["-fno-semantic-interposition"]):
+                    cflags += ["-fno-semantic-interposition"]
+
+                if os.environ.get('LIBUSB_PACKAGE_DEV_WARNINGS'):
+                    cflags += [
+                        "-Winline",
+                        "-Wmissing-include-dirs",
+                        "-Wnested-externs",
+                        "-Wpointer-arith",
+                        "-Wredundant-decls",
+                        "-Wswitch-enum",
+                        ]
 
                 if sys.platform.startswith('linux'):
                     # Don't include libudev (for now) on Linux since it isn't in the CI runner image. It's
                     # excluded even on non-CI builds to keep the same feature set.
                     extra_configure_args = ['--disable-udev']
+
+                    # Call external functions directly through the GOT rather than via the PLT.
+                    cflags += ["-fno-plt"]
                 else:
                     extra_configure_args = []
 
@@ -150,14 +303,63 @@ class libusb_build_ext(build_ext):
                                 print(f"Warning: failure to extract architecture from ARCHFLAGS='{archflags}' ({err})")
 
                 os.environ['CFLAGS'] = ' '.join(cflags)
+                # Append to any linker flags provided by the environment, for instance for a sysroot.
+                ldflags = [*shlex.split(os.environ.get('LDFLAGS', '')), *ldflags]
+                os.environ['LDFLAGS'] = ' '.join(ldflags)
+
+                # Wrap the compilers with ccache or sccache if available, to speed up rebuilds. Compilers
+                # that are already wrapped are left alone, since ccache fails on recursive invocation.
+                compiler_cache = find_compiler_cache('ccache', 'sccache')
+                if compiler_cache:
+                    print(f"Using compiler cache {compiler_cache}")
+                    if not is_compiler_cached(cc):
+                        cc = f"{compiler_cache.name} {cc}"
+                    if not is_compiler_cached(cxx):
+                        cxx = f"{compiler_cache.name} {cxx}"
+                os.environ['CC'] = cc
+                os.environ['CXX'] = cxx
+
+                # Let any nested make invocations inherit the job count.
+                os.environ.setdefault('MAKEFLAGS', f'-j{jobs}')
+
+                # Record the build configuration in a stamp file so a clean is only required when the
+                # configuration changes. Otherwise existing object files are reused.
+                config_hash = hashlib.sha1(repr(extra_configure_args + cflags + ldflags
+                        + [os.environ.get('CC', '')]).encode()).hexdigest()
+                config_stamp = build_temp / ".libusb_build_config"
+                is_config_changed = (not config_stamp.is_file()
+                        or config_stamp.read_text().strip() != config_hash)
+
+                # For incremental builds, reuse an existing configuration if configure hasn't been
+                # regenerated since it was last run. Only enabled on request, since changes to the
+                # environment other than the configure args, CFLAGS, LDFLAGS, and CC won't be detected.
+                config_status = build_temp / "config.status"
+                is_configured = (os.environ.get('LIBUSB_PACKAGE_INCREMENTAL') == '1'
+                        and not is_config_changed
+                        and CONFIGURE_SCRIPT.is_file()
+                        and config_status.is_file()
+                        and config_status.stat().st_mtime > CONFIGURE_SCRIPT.stat().st_mtime)
+
+                # Run bootstrap.sh, configure, and make. The commands are run in a single shell invocation
+                # to avoid the cost of starting a shell for each, which is significant on MSYS.
+                commands = [['env']] # Dump environment for debugging purposes.
+                if is_configured:
+                    print("Incremental build: skipping bootstrap and configure")
+                else:
+                    commands += [
+                        ['bash', str(BOOTSTRAP_SCRIPT)],
+                        ['bash', str(CONFIGURE_SCRIPT), *extra_configure_args],
+                        ]
+                    if is_config_changed:
+                        commands += [['make', 'clean']]
+                commands += [['make', f'-j{jobs}', 'all']]
+                script = ' && '.join(' '.join(shlex.quote(arg) for arg in cmd) for cmd in commands)
 
-                # Run bootstrap.sh, configure, and make.
                 try:
-                    self.spawn(['env']) # Dump environment for debugging purposes.
-                    self.spawn(['bash', str(BOOTSTRAP_SCRIPT)])
-                    self.spawn(['bash', str(CONFIGURE_SCRIPT), *extra_configure_args])
-                    self.spawn(['make', 'clean'])
-                    self.spawn(['make', f'-j{os.cpu_count() or 4}', 'all'])
+                    self._spawn_logged(['bash', '-c', script])
+                    # Don't record a configuration that wasn't actually built.
+                    if not self.dry_run:
+                        config_stamp.write_text(config_hash)
                 except Exception as err:
                     # Exception is caught here and reraised as our specific Exception class because the actual
                     # DistutilsExecError class raised on exceptions appears to be difficult to import to use in
@@ -165,57 +367,70 @@ class libusb_build_ext(build_ext):
                     # Otoh, catching and ignoring all Exceptions (below) would be bad.
                     raise LibusbBuildError(str(err)) from err
 
-                if sys.platform == 'darwin':
-                    shared_library_suffix = 'dylib'
-                elif sys.platform == 'cygwin' or sys.platform == 'win32':
-                    shared_library_suffix = 'dll'
-                else:
-                    shared_library_suffix = 'so'
-                lib_paths = [Path(g) for g in glob.glob(f"libusb/.libs/*.{shared_library_suffix}")]
-
-                # Sort libs by filename length. The shortest filename should be the most generic version.
-                lib_paths = sorted(lib_paths, key=lambda x: len(x.name))
+                lib_paths = find_files_with_suffix(Path("libusb", ".libs"), get_shared_library_suffix())
             else:
-                platform = "x64" if IS_64_BIT else "x86"
+                msbuild_platform = "x64" if IS_64_BIT else "x86"
                 config = "Release"
 
+                # Build with multiple msbuild nodes, and limit the number of parallel cl.exe processes
+                # for projects that enable MultiProcessorCompilation.
+                msbuild_args = [
+                    f'-m:{jobs}',
+                    f'-p:CL_MPCount={jobs}',
+                    f'-p:Configuration={config}',
+                    f'-p:Platform={msbuild_platform}',
+                    # Enable whole program optimization (/GL and /LTCG).
+                    '-p:WholeProgramOptimization=true',
+                    ]
+
+                # Wrap cl.exe with sccache if available. ccache doesn't support MSVC.
+                compiler_cache = find_compiler_cache('sccache')
+                if compiler_cache:
+                    print(f"Using compiler cache {compiler_cache}")
+                    msbuild_args += [
+                        f'-p:CLToolExe={compiler_cache.name}',
+                        f'-p:CLToolPath="{compiler_cache.parent}"',
+                        ]
+
                 try:
-                    self.spawn(['cmd.exe', '/c', f'{VSENV_SCRIPT} && '
-                            f'msbuild -p:Configuration={config} -p:Platform={platform} {VS_PROJ}'])
+                    self._spawn_logged(['cmd.exe', '/c', f'{VSENV_SCRIPT} && '
+                            f'msbuild {" ".join(msbuild_args)} {VS_PROJ}'])
                 except Exception as err:
                     # See comment above for notes about this exception handler.
                     raise LibusbBuildError(str(err)) from err
 
                 out_dir = "x64" if IS_64_BIT else "Win32"
-                lib_paths = [Path(g) for g in glob.glob(f"{out_dir}\\{config}\\dll\\*.dll")]
+                lib_paths = find_files_with_suffix(Path(out_dir, config, "dll"), get_shared_library_suffix())
 
             if not lib_paths:
                 raise LibusbBuildError(f"libusb failed to build: no libraries found in {build_temp}")
 
-            lib_path = lib_paths[0]
+            # Use the lib with the shortest filename, which should be the most generic version.
+            lib_path = min(lib_paths, key=lambda p: len(p.name))
             print(f"lib_path={lib_path}")
 
             # Copy the built C-extension to the place expected by the Python build.
             name = lib_path.name
             dest_path = build_lib / PACKAGE_NAME / name
-            if dest_path.exists() or dest_path.is_symlink():
-                print(f"{dest_path} already exists; unlinking")
-                dest_path.unlink()
-            self.mkpath(str(dest_path.parent))
-            if not self.inplace:
-                print(f"Copying built {lib_path} to output path {dest_path}")
-                shutil.copy(lib_path, dest_path, follow_symlinks=True)
+            link_dest = get_relative_sibling_path(dest_path.parent, lib_path) if self.inplace else None
+            # For inplace builds, leave an existing symlink alone if it already points to the built
+            # library. This keeps rebuilds cheap and doesn't disturb a library that is currently loaded.
+            if link_dest and dest_path.is_symlink() and os.readlink(dest_path) == str(link_dest):
+                print(f"Inplace: output path {dest_path} is already linked to built {lib_path}")
             else:
-                print(f"Inplace: linking output path {dest_path} to built {lib_path}")
-                link_dest = get_relative_sibling_path(dest_path.parent, lib_path)
-                print(f"Link dest is {link_dest}")
-                # Sadly, creating symlinks on Windows requires elevated permissions.
-                try:
-                    dest_path.symlink_to(link_dest)
-                except OSError as err:
-                    print(f"Error attempting to create symlink: {err}")
-                    shutil.copy(lib_path, dest_path, follow_symlinks=True)
-                    print(f"Falling back to copying built {lib_path} to output path {dest_path}")
+                self._prepare_dest_path(dest_path)
+                if not self.inplace:
+                    link_or_copy_library(lib_path, dest_path)
+                else:
+                    print(f"Inplace: linking output path {dest_path} to built {lib_path}")
+                    print(f"Link dest is {link_dest}")
+                    # Sadly, creating symlinks on Windows requires elevated permissions.
+                    try:
+                        dest_path.symlink_to(link_dest)
+                    except OSError as err:
+                        print(f"Error attempting to create symlink: {err}")
+                        copy_library(lib_path, dest_path)
+                        print(f"Falling back to copying built {lib_path} to output path {dest_path}")
             if not Path(dest_path).exists():
                 raise LibusbBuildError(f"failed to copy/link destination file at {dest_path}")
             self._found_names.append(name)
@@ -229,6 +444,56 @@ class libusb_build_ext(build_ext):
         else:
             raise
 
+  def _spawn_logged(self, cmd: List[str]) -> None:
+    """@brief Run a build command with its output captured to a temporary log file.
+
+    The log is only printed if the command fails. This avoids stalling the build on slow console
+    or CI log output. Set the LIBUSB_PACKAGE_VERBOSE env var to 1 to pass output through instead.
+    """
+    if os.environ.get('LIBUSB_PACKAGE_VERBOSE') == '1':
+        self.spawn(cmd)
+        return
+
+    print(' '.join(cmd))
+    if self.dry_run:
+        return
+    with tempfile.TemporaryFile() as log_file:
+        returncode = subprocess.call(cmd, stdout=log_file, stderr=subprocess.STDOUT)
+        if returncode != 0:
+            log_file.seek(0)
+            print(log_file.read().decode(errors='replace'))
+            raise LibusbBuildError(f"command {cmd[0]!r} failed with exit status {returncode}")
+
+  def _prepare_dest_path(self, dest_path: Path) -> None:
+    """@brief Remove an existing file at the output path and make sure its directory exists."""
+    if dest_path.exists() or dest_path.is_symlink():
+        print(f"{dest_path} already exists; unlinking")
+        dest_path.unlink()
+    self.mkpath(str(dest_path.parent))
+
+  def _install_prebuilt(self, build_lib: Path) -> bool:
+    """@brief Install a prebuilt libusb for the current platform, if one is available.
+
+    Prebuilt libraries are looked up at `src/libusb_package/_prebuilt/<sys.platform>-<machine>/`,
+    where `<machine>` is the target architecture returned by get_target_machine().
+
+    @retval True A prebuilt library was installed.
+    @retval False No prebuilt library is available.
+    """
+    name = 'libusb-1.0' + get_shared_library_suffix()
+    plat_key = f"{sys.platform}-{get_target_machine()}"
+    prebuilt_path = PREBUILT_DIR / plat_key / name
+    if not prebuilt_path.is_file():
+        return False
+
+    print(f"Using prebuilt library {prebuilt_path}")
+    dest_path = build_lib / PACKAGE_NAME / name
+    self._prepare_dest_path(dest_path)
+    link_or_copy_library(prebuilt_path, dest_path)
+    self._found_names.append(name)
+    self._found_paths.append(str(prebuilt_path))
+    return True
+
   def get_names(self):
     return self._found_names
 
@@ -17,11 +17,10 @@
 from __future__ import annotations
 
 import atexit
-import ctypes.util
+import contextlib
 import functools
-import platform
 import sys
-from typing import (Any, Optional, TYPE_CHECKING)
+from typing import (Any, FrozenSet, Optional, Tuple, TYPE_CHECKING)
 
 import importlib_resources
 
@@ -33,34 +32,83 @@ if TYPE_CHECKING:
 
 __all__ = ['find_library', 'get_libusb1_backend', 'find']
 
-# Look up the expected shared library filename extension by the OS.
-_LIBRARY_MAP_EXT = {
-        'Darwin': '.dylib',
-        'Linux': '.so',
-        'Windows': '.dll',
-    }
-_LIBRARY_EXT = _LIBRARY_MAP_EXT.get(platform.system(), ".so")
+# Look up the expected shared library filename extension by the OS. sys.platform is used rather than
+# platform.system() to avoid the cost of importing the platform module.
+_IS_LINUX = sys.platform.startswith('linux')
+if sys.platform == 'darwin':
+    _LIBRARY_EXT = '.dylib'
+elif sys.platform == 'win32':
+    _LIBRARY_EXT = '.dll'
+else:
+    _LIBRARY_EXT = '.so'
 _LIBRARY_NAME = 'libusb-1.0' + _LIBRARY_EXT
 
-@functools.lru_cache()
+# Holds the contexts for resources extracted to files, which are cleaned up when the process exits.
+_path_stack = contextlib.ExitStack()
+atexit.register(_path_stack.close)
+
+# Sentinel for cached values that haven't been computed yet, since None is a valid cached value.
+_UNSET: Any = object()
+
+_library_path: Optional[Path] = _UNSET
+_library_match: Optional[Tuple[str, FrozenSet[str]]] = _UNSET
+_libusb1_backend: Optional[IBackend] = _UNSET
+
+def _clear_caches() -> None:
+    """@brief Reset the cached library path, library match, and backend.
+
+    The cached values are recomputed on next use. This replaces the `cache_clear()` methods that
+    were available when these functions used `functools.lru_cache()`, for tests and embedders.
+    """
+    global _library_path, _library_match, _libusb1_backend
+    _library_path = _UNSET
+    _library_match = _UNSET
+    _libusb1_backend = _UNSET
+    _find_system_library.cache_clear()
+
+
 def get_library_path() -> Optional[Path]:
     """@brief Returns the path to included library, if there is one.
 
     The path is valid until the process exits. If the library was extracted from a zip in order to
     be accessible as a file, it will be cleaned up with the process exits.
     """
-    lib_resource = importlib_resources.files(__name__).joinpath(_LIBRARY_NAME)
-    if lib_resource.is_file():
-        path_context = importlib_resources.as_file(lib_resource)
-        path = path_context.__enter__()
+    global _library_path
+    if _library_path is _UNSET:
+        lib_resource = importlib_resources.files(__name__).joinpath(_LIBRARY_NAME)
+        if lib_resource.is_file():
+            _library_path = _path_stack.enter_context(importlib_resources.as_file(lib_resource))
+        else:
+            _library_path = None
+    return _library_path
+
 
-        @atexit.register
-        def cleanup():
-            path_context.__exit__(None, None, None)
+def _get_library_match() -> Optional[Tuple[str, FrozenSet[str]]]:
+    """@brief Returns the included library's path and the set of candidate names that match it.
 
-        return path
-    else:
-        return None
+    A candidate matches if the library's filename starts with it. On Linux, a candidate also
+    matches if the library's filename starts with the candidate prefixed by "lib".
+    """
+    global _library_match
+    if _library_match is _UNSET:
+        lib_path = get_library_path()
+        if not lib_path:
+            _library_match = None
+        else:
+            lib_name = lib_path.name
+            candidates = {lib_name[:i] for i in range(len(lib_name) + 1)}
+            if _IS_LINUX and lib_name.startswith("lib"):
+                candidates.update(lib_name[3:i] for i in range(3, len(lib_name) + 1))
+            _library_match = (str(lib_path), frozenset(candidates))
+    return _library_match
+
+
+@functools.lru_cache(maxsize=32)
+def _find_system_library(candidate: str) -> Optional[str]:
+    """@brief Cached wrapper for ctypes' find_library, which can be slow (it may run ldconfig)."""
+    # ctypes is imported here so it is only loaded if needed.
+    import ctypes.util
+    return ctypes.util.find_library(candidate)
 
 
 def find_library(candidate: str) -> Optional[str]:
@@ -72,16 +120,14 @@ def find_library(candidate: str) -> Optional[str]:
     @retval str Path to the contained library matching the candidate name.
     @retval None No library matching the candidate name is contained in libusb_package.
     """
-    lib_path = get_library_path()
-    if not lib_path:
+    match = _get_library_match()
+    if match is None:
         # There is no library included in our installation, fall back to ctypes' find_library.
-        return ctypes.util.find_library(candidate)
+        return _find_system_library(candidate)
 
-    lib_name = lib_path.name
-
-    if lib_name.startswith(candidate) \
-            or ((platform.system() == "Linux") and lib_name.startswith("lib" + candidate)):
-        return str(lib_path)
+    lib_path, candidates = match
+    if candidate in candidates:
+        return lib_path
 
     # We don't have a matching library.
     return None
@@ -90,12 +136,17 @@ def find_library(candidate: str) -> Optional[str]:
 # pyusb is imported within the following functions so it isn't strictly required as a
 # dependency unless these functions are used.
 
-@functools.lru_cache()
 def get_libusb1_backend() -> Optional[IBackend]:
     """@brief Return a usb backend for pyusb."""
-    import usb.backend.libusb1
-    return usb.backend.libusb1.get_backend(find_library=find_library)
+    global _libusb1_backend
+    if _libusb1_backend is _UNSET:
+        import usb.backend.libusb1
+        _libusb1_backend = usb.backend.libusb1.get_backend(find_library=find_library)
+    return _libusb1_backend
+
 
+# pyusb's usb.core module, bound on the first call to find().
+_usb_core: Any = None
 
 # TODO refine the type signature of find()
 def find(*args: Any, **kwargs: Any) -> Any:
@@ -105,8 +156,10 @@ def find(*args: Any, **kwargs: Any) -> Any:
     If None is passed for 'backend', then the default backend lookup method of pyusb will
     be used.
     """
-    import usb.core
+    global _usb_core
+    if _usb_core is None:
+        import usb.core as _usb_core
     backend = kwargs.pop('backend', get_libusb1_backend())
-    return usb.core.find(*args, backend=backend, **kwargs)
+    return _usb_core.find(*args, backend=backend, **kwargs)
 
 